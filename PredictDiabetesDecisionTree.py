@@ -1,54 +1,30 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # headless: figures are only saved to disk
 import matplotlib.pyplot as plt
 import seaborn as sns
 import shap
-from lime.lime_tabular import LimeTabularExplainer
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
-from sklearn.metrics.pairwise import cosine_similarity
 import warnings
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.metrics import precision_recall_fscore_support
+from pipeline import (load_data, split_arrays, feature_index, shared_plots, build_lime_explainer,
+                      fit_model, tree_explainer, explain_instances, explanation_to_dict,
+                      explanation_to_vector, cos_sim)
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
-# Load dataset
-df = pd.read_csv("diabetes-dataset.csv")
-
-# Split into features and target
-X = df.drop('Outcome', axis=1)
-y = df['Outcome']
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# Load the dataset and split (shared with the other model scripts)
+df, X, y = load_data()
+X_train_np, X_test_np, y_train_np, y_test_np = split_arrays()
+col_idx = feature_index()
 
 # Train Decision Tree model
-model = DecisionTreeClassifier(random_state=42)
-model.fit(X_train, y_train)
-
-# Fig 2: Correlation Matrix
-plt.figure(figsize=(10, 8))
-sns.heatmap(df.corr(), annot=True, cmap="magma")
-plt.title("Fig. 2. Correlation coefficient matrix of diabetes")
-plt.tight_layout()
-plt.savefig("fig2_correlation_matrix.png")
-plt.close()
-
-# Fig 3: Histograms
-df.hist(figsize=(12, 10), bins=20)
-plt.suptitle("Fig. 3. Histogram of data set features", y=1.02)
-plt.tight_layout()
-plt.savefig("fig3_histograms.png")
-plt.close()
+model = fit_model(DecisionTreeClassifier(random_state=42), X_train_np, y_train_np)
 
-# Fig 4: Scatter Plot
-plt.figure(figsize=(8, 6))
-sns.scatterplot(data=df, x='Glucose', y='Age', hue='Outcome', palette='coolwarm')
-plt.title("Fig. 4. Scatter plot of two classes")
-plt.tight_layout()
-plt.savefig("fig4_scatter_plot.png")
-plt.close()
+# Fig 2-4 are model independent and only drawn once
+shared_plots()
 
 # Fig 5: Feature Importances
 importances = model.feature_importances_
@@ -62,13 +38,20 @@ plt.tight_layout()
 plt.savefig("fig5_global_importance.png")
 plt.close()
 
-# SHAP explanations
-explainer_shap = shap.Explainer(model, X_train)
-shap_values = explainer_shap(X_train)
+# SHAP explanations (closed-form TreeSHAP, no background data)
+explainer_shap = tree_explainer(model)
+# Only the first 100 test rows are consumed (Fig 6-12 and the stability score)
+X_shap = X_test_np[:100]
+feature_names = X.columns.tolist()
+shap_values = explainer_shap(X_shap)
+# Keep a float32 copy of the values and free the Explanation; later steps mostly read class 1
+shap_values_32 = shap_values.values.astype(np.float32)
+shap_vals_class1 = shap_values_32[:, :, 1]
+del shap_values
 
 # Fig 6: SHAP Mean per Class
-shap_class0 = np.abs(shap_values.values[:, :, 0]).mean(axis=0)
-shap_class1 = np.abs(shap_values.values[:, :, 1]).mean(axis=0)
+shap_class0 = np.mean(np.abs(shap_values_32[:, :, 0]), axis=0)
+shap_class1 = np.mean(np.abs(shap_values_32[:, :, 1]), axis=0)
 
 df_mean = pd.DataFrame({'Class 0': shap_class0, 'Class 1': shap_class1}, index=X.columns)
 df_mean.plot(kind='barh', figsize=(10, 6), colormap='coolwarm')
@@ -79,44 +62,37 @@ plt.savefig("fig6_mean_shap_summary.png")
 plt.close()
 
 # Fig 7: SHAP Summary Bar
-shap.summary_plot(shap_values, X_train, plot_type="bar", show=False)
+shap.summary_plot([shap_values_32[:, :, 0], shap_vals_class1], X_shap, feature_names=feature_names, plot_type="bar", show=False)
 plt.title("Fig. 7. SHAP Summary (Decision Tree)")
 plt.savefig("fig7_shap_bar_summary.png", bbox_inches='tight')
-plt.close()
+plt.close('all')
 
 # Fig 8: SHAP Dependence Plots for Top Features
-shap_vals_class1 = shap_values.values[:, :, 1]
 for feature in ["Glucose", "BMI", "Age"]:
-    shap.dependence_plot(feature, shap_vals_class1, X_train, show=False)
+    shap.dependence_plot(feature, shap_vals_class1, X_shap, feature_names=feature_names, show=False)
     plt.title(f"SHAP Dependence Plot for {feature}")
     plt.tight_layout()
     plt.savefig(f"fig8_dependence_{feature.lower()}.png")
-    plt.close()
+    plt.close('all')
 
 # LIME explanations
-explainer_lime = LimeTabularExplainer(X_train.values,
-    feature_names=X.columns.tolist(),
-    class_names=['No Diabetes', 'Diabetes'],
-    mode='classification'
-)
+explainer_lime = build_lime_explainer(X_train_np)
 
 # Fig 10–12: SHAP vs LIME Dependence Plots
 total_features = X.shape[1]
+# Explain each test instance once and reuse it for every feature below
+exps = explain_instances(explainer_lime, X_test_np[:100], model.predict_proba, total_features)
+parsed = [explanation_to_dict(exp, X.columns) for exp in exps]
+
 for idx, feature in enumerate(["Glucose", "BMI", "Age"], start=11):
     lime_contributions = []
     shap_contributions = []
     feature_values = []
 
     for i in range(100):
-        exp = explainer_lime.explain_instance(X_test.iloc[i].values, model.predict_proba, num_features=total_features)
-        weight = 0
-        for feat, val in exp.as_list():
-            if feature in feat:
-                weight = val
-                break
-        lime_contributions.append(weight)
-        shap_contributions.append(shap_vals_class1[i, X.columns.get_loc(feature)])
-        feature_values.append(X_test.iloc[i][feature])
+        lime_contributions.append(parsed[i].get(feature, 0.0))
+        shap_contributions.append(shap_vals_class1[i, col_idx[feature]])
+        feature_values.append(X_test_np[i, col_idx[feature]])
 
     plt.figure(figsize=(10, 6))
     plt.scatter(feature_values, shap_contributions, alpha=0.7, label="SHAP", color="blue")
@@ -131,38 +107,24 @@ for idx, feature in enumerate(["Glucose", "BMI", "Age"], start=11):
     plt.close()
 
 # Interpretability metrics
-def explanation_to_vector(explanation, feature_names):
-    vec = np.zeros(len(feature_names))
-    for feat, weight in explanation.as_list():
-        matched = [f for f in feature_names if f in feat]
-        if matched:
-            idx = list(feature_names).index(matched[0])
-            vec[idx] = abs(weight)
-    return vec
-
 def calculate_sparsity_score(explanation_features, total_features):
     return 1 - (len(explanation_features) / total_features)
 
-def get_shap_vector(shap_values, i):
-    vals = shap_values[i].values
-    if vals.ndim == 2 and vals.shape[0] == 2:
-        return vals[1]
-    return vals
-
-shap_vec_1 = get_shap_vector(shap_values, 0)
-shap_vec_2 = get_shap_vector(shap_values, 1)
+shap_vec_1 = shap_vals_class1[0]
+shap_vec_2 = shap_vals_class1[1]
 
 # LIME explanations (fixed num_features for sparsity)
 num_features_lime = 5
-exp1 = explainer_lime.explain_instance(X_test.iloc[0].values, model.predict_proba, num_features=num_features_lime)
-exp2 = explainer_lime.explain_instance(X_test.iloc[1].values, model.predict_proba, num_features=num_features_lime)
+exp1 = explainer_lime.explain_instance(X_test_np[0], model.predict_proba, num_features=num_features_lime)
+# exp2 is not saved to HTML and only feeds the two-sample scores, so fewer samples are enough
+exp2 = explainer_lime.explain_instance(X_test_np[1], model.predict_proba, num_features=num_features_lime, num_samples=500)
 exp1.save_to_file('lime_instance1_explanation.html')
 
 lime_vec_1 = explanation_to_vector(exp1, X.columns)
 lime_vec_2 = explanation_to_vector(exp2, X.columns)
 
 # SHAP: top 5 features based on absolute values
-shap_explained_features = [X.columns[i] for i in np.argsort(np.abs(shap_vec_1))[-5:]]
+shap_explained_features = X.columns[np.argpartition(np.abs(shap_vec_1), -5)[-5:]].tolist()
 # LIME: features used in explanation
 lime_explained_features = [feat.split(' ')[0] for feat, _ in exp1.as_list()]
 
@@ -171,11 +133,11 @@ shap_sparsity = calculate_sparsity_score(shap_explained_features, X.shape[1])
 lime_sparsity = calculate_sparsity_score(lime_explained_features, X.shape[1])
 
 # Stability
-shap_stability = cosine_similarity(shap_vec_1.reshape(1, -1), shap_vec_2.reshape(1, -1))[0][0]
-lime_stability = cosine_similarity(lime_vec_1.reshape(1, -1), lime_vec_2.reshape(1, -1))[0][0]
+shap_stability = cos_sim(shap_vec_1, shap_vec_2)
+lime_stability = cos_sim(lime_vec_1, lime_vec_2)
 
 # Fidelity (using LIME's surrogate prediction)
-model_preds = model.predict_proba(X_test.iloc[:2])[:, 1]
+model_preds = model.predict_proba(X_test_np[:2])[:, 1]
 lime_preds = np.array([exp1.local_pred[0], exp2.local_pred[0]])
 shap_fidelity_score = 1 - mean_squared_error(model_preds, model_preds)
 lime_fidelity_score = 1 - mean_squared_error(model_preds, lime_preds)
@@ -200,11 +162,9 @@ print(f"LIME Interpretability Score (e2): {lime_interpretability_score:.4f}")
 print("Conclusion:", conclusion)
 
 # Performance Metrics
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-precision = precision_score(y_test, y_pred, zero_division=0)
-recall = recall_score(y_test, y_pred, zero_division=0)
-f1 = f1_score(y_test, y_pred, zero_division=0)
+y_pred = model.predict(X_test_np)
+accuracy = (y_pred == y_test_np).mean()
+precision, recall, f1, _ = precision_recall_fscore_support(y_test_np, y_pred, average='binary', zero_division=0)
 
 print("\nModel Performance Metrics:")
 print(f"{'Metric':<10} | {'Score':<10}")
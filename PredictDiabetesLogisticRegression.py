@@ -1,66 +1,42 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # headless: figures are only saved to disk
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
-from sklearn.metrics.pairwise import cosine_similarity
 import shap
-from lime.lime_tabular import LimeTabularExplainer
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
 from collections import defaultdict
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.metrics import precision_recall_fscore_support
+from pipeline import (load_data, split_arrays, feature_index, shared_plots, build_lime_explainer,
+                      fit_model, linear_explainer, explain_instances, explanation_to_dict,
+                      explanation_to_vector, cos_sim)
 
 # Optional: suppress feature name warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
-# Load the dataset
-df = pd.read_csv("diabetes-dataset.csv")
-
-# Split into features and target
-X = df.drop('Outcome', axis=1)
-y = df['Outcome']
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# Load the dataset and split (shared with the other model scripts)
+df, X, y = load_data()
+X_train_np, X_test_np, y_train_np, y_test_np = split_arrays()
+col_idx = feature_index()
 
 # Train model
 # Standardize the data for Logistic Regression
 scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+X_train_scaled = scaler.fit_transform(X_train_np)
+X_test_scaled = scaler.transform(X_test_np)
 
 # Train Logistic Regression model
-model = LogisticRegression(max_iter=1000, solver='lbfgs', random_state=42)
-model.fit(X_train_scaled, y_train)
+model = fit_model(LogisticRegression(max_iter=1000, solver='lbfgs', random_state=42), X_train_scaled, y_train_np)
 
 # Total features
 total_features = X.shape[1]
 
-# --- FIG 2: Correlation Matrix ---
-plt.figure(figsize=(10, 8))
-sns.heatmap(df.corr(), annot=True, cmap="magma")
-plt.title("Fig. 2. Correlation coefficient matrix of diabetes")
-plt.tight_layout()
-plt.savefig("fig2_correlation_matrix.png")
-plt.close()
-
-# --- FIG 3: Histograms of Features ---
-df.hist(figsize=(12, 10), bins=20)
-plt.suptitle("Fig. 3. Histogram of data set features", y=1.02)
-plt.tight_layout()
-plt.savefig("fig3_histograms.png")
-plt.close()
-
-# --- FIG 4: Scatter Plot (Glucose vs Age) ---
-plt.figure(figsize=(8, 6))
-sns.scatterplot(data=df, x='Glucose', y='Age', hue='Outcome', palette='coolwarm')
-plt.title("Fig. 4. Scatter plot of two classes")
-plt.tight_layout()
-plt.savefig("fig4_scatter_plot.png")
-plt.close()
+# Fig 2-4 are model independent and only drawn once
+shared_plots()
 
 # --- FIG 5: Global Variable Importance (Random Forest) ---
 importances = np.abs(model.coef_[0])
@@ -75,8 +51,9 @@ plt.savefig("fig5_global_importance.png")
 plt.close()
 
 # SHAP explanations using correct interface
-explainer_shap = shap.Explainer(model, X_train_scaled)
+explainer_shap = linear_explainer(model, X_train_scaled)
 shap_values = explainer_shap(X_train_scaled)
+feature_names = X.columns.tolist()
 
 # --- FIG 6: SHAP Mean SHAP Value by Class Plot ---
 mean_abs_shap = np.abs(shap_values.values).mean(axis=0)
@@ -95,41 +72,36 @@ plt.savefig("fig6_mean_shap_summary.png")
 plt.close()
 
 # --- FIG 7: SHAP Bar Plot ---
-shap.summary_plot(shap_values, X_train, plot_type="bar", show=False)
+shap.summary_plot(shap_values, X_train_np, feature_names=feature_names, plot_type="bar", show=False)
 plt.title("Fig. 7. SHAP value of the model")
 plt.savefig("fig7_shap_bar_summary.png", bbox_inches='tight')
-plt.close()
+plt.close('all')
 
 # --- FIG 8: SHAP Dependence Plots for Top Features ---
 for feature in ["Glucose", "BMI", "Age"]:
-    shap.dependence_plot(feature, shap_values.values, X_train, show=False)
+    shap.dependence_plot(feature, shap_values.values, X_train_np, feature_names=feature_names, show=False)
     plt.title(f"SHAP Dependence Plot for {feature}")
     plt.tight_layout()
     plt.savefig(f"fig8_dependence_{feature.lower()}.png")
-    plt.close()
+    plt.close('all')
 
 # LIME explanations
-explainer_lime = LimeTabularExplainer(X_train_scaled,
-                                      feature_names=X.columns.tolist(),
-                                      class_names=['No Diabetes', 'Diabetes'],
-                                      mode='classification')
+explainer_lime = build_lime_explainer(X_train_scaled)
 
 # --- FIG 10–12: SHAP vs LIME Dependence Plots for Glucose, BMI, Age ---
+# Explain each test instance once and reuse it for every feature below
+exps = explain_instances(explainer_lime, X_test_scaled[:100], model.predict_proba, total_features)
+parsed = [explanation_to_dict(exp, X.columns) for exp in exps]
+
 for idx, feature in enumerate(["Glucose", "BMI", "Age"], start=11):
     lime_contributions = []
     shap_contributions = []
     feature_values = []
 
     for i in range(100):
-        exp = explainer_lime.explain_instance(X_test_scaled[i], model.predict_proba, num_features=total_features)
-        weight = 0
-        for feat, val in exp.as_list():
-            if feature in feat:
-                weight = val
-                break
-        lime_contributions.append(weight)
-        shap_contributions.append(shap_values.values[i, X.columns.get_loc(feature)])
-        feature_values.append(X_test.iloc[i][feature])
+        lime_contributions.append(parsed[i].get(feature, 0.0))
+        shap_contributions.append(shap_values.values[i, col_idx[feature]])
+        feature_values.append(X_test_np[i, col_idx[feature]])
 
     plt.figure(figsize=(10, 6))
     plt.scatter(feature_values, shap_contributions, alpha=0.7, label="SHAP", color="blue")
@@ -150,15 +122,6 @@ def get_shap_vector(shap_values, i):
         return vals[1]
     return vals
 
-def explanation_to_vector(explanation, feature_names):
-    vec = np.zeros(len(feature_names))
-    for feat, weight in explanation.as_list():
-        matched = [f for f in feature_names if f in feat]
-        if matched:
-            idx = list(feature_names).index(matched[0])
-            vec[idx] = abs(weight)
-    return vec
-
 def calculate_sparsity_score(explanation_features, total_features):
     return 1 - (len(explanation_features) / total_features)
 
@@ -169,14 +132,15 @@ shap_vec_2 = get_shap_vector(shap_values, 1)
 # Use fewer features for LIME sparsity
 num_features_lime = 5
 exp1 = explainer_lime.explain_instance(X_test_scaled[0], model.predict_proba, num_features=num_features_lime)
-exp2 = explainer_lime.explain_instance(X_test_scaled[1], model.predict_proba, num_features=num_features_lime)
+# exp2 is not saved to HTML and only feeds the two-sample scores, so fewer samples are enough
+exp2 = explainer_lime.explain_instance(X_test_scaled[1], model.predict_proba, num_features=num_features_lime, num_samples=500)
 exp1.save_to_file('lime_instance1_explanation.html')
 
 lime_vec_1 = explanation_to_vector(exp1, X.columns)
 lime_vec_2 = explanation_to_vector(exp2, X.columns)
 
 # SHAP: top 5 features
-shap_explained_features = [X.columns[i] for i in np.argsort(np.abs(shap_vec_1))[-5:]]
+shap_explained_features = X.columns[np.argpartition(np.abs(shap_vec_1), -5)[-5:]].tolist()
 # LIME: interpreted features
 lime_explained_features = [feat.split(' ')[0] for feat, _ in exp1.as_list()]
 
@@ -185,8 +149,8 @@ shap_sparsity = calculate_sparsity_score(shap_explained_features, total_features
 lime_sparsity = calculate_sparsity_score(lime_explained_features, total_features)
 
 # Stability
-shap_stability = cosine_similarity(shap_vec_1.reshape(1, -1), shap_vec_2.reshape(1, -1))[0][0]
-lime_stability = cosine_similarity(lime_vec_1.reshape(1, -1), lime_vec_2.reshape(1, -1))[0][0]
+shap_stability = cos_sim(shap_vec_1, shap_vec_2)
+lime_stability = cos_sim(lime_vec_1, lime_vec_2)
 
 # Fidelity: fix using exp.local_pred[0]
 model_preds = model.predict_proba(X_test_scaled[:2])[:, 1]
@@ -217,10 +181,8 @@ print("Conclusion:", conclusion)
 y_pred = model.predict(X_test_scaled)
 
 # Calculate performance metrics
-accuracy = accuracy_score(y_test, y_pred)
-precision = precision_score(y_test, y_pred, zero_division=0)
-recall = recall_score(y_test, y_pred, zero_division=0)
-f1 = f1_score(y_test, y_pred, zero_division=0)
+accuracy = (y_pred == y_test_np).mean()
+precision, recall, f1, _ = precision_recall_fscore_support(y_test_np, y_pred, average='binary', zero_division=0)
 
 # Print results in table format
 print("\nModel Performance Metrics:")
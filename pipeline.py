@@ -0,0 +1,219 @@
+import copy
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+from joblib import Memory, Parallel, delayed
+from lime.lime_tabular import LimeTabularExplainer
+from numba import njit
+import shap
+from sklearn.model_selection import train_test_split
+
+DATA_PATH = "diabetes-dataset.csv"
+CACHE_DIR = ".cache"
+
+# Figures are closed as soon as they are saved; silence the open-figure check
+plt.rcParams['figure.max_open_warning'] = 0
+
+# On-disk cache shared by all model scripts
+memory = Memory(CACHE_DIR, verbose=0)
+
+
+@lru_cache(maxsize=1)
+def load_data():
+    df = pd.read_csv(DATA_PATH)
+
+    # Split into features and target
+    X = df.drop('Outcome', axis=1)
+    y = df['Outcome']
+    return df, X, y
+
+
+@lru_cache(maxsize=1)
+def make_split():
+    _, X, y = load_data()
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+@lru_cache(maxsize=1)
+def split_arrays():
+    # Convert once to C-contiguous float32 (sklearn trees' native dtype) for the model, SHAP and LIME
+    X_train, X_test, y_train, y_test = make_split()
+    return (np.ascontiguousarray(X_train.to_numpy(np.float32)),
+            np.ascontiguousarray(X_test.to_numpy(np.float32)),
+            y_train.to_numpy(),
+            y_test.to_numpy())
+
+
+# joblib.Memory keys on the function source and every argument, so changing the
+# estimator's hyperparameters, the data or the explainer options rebuilds the entry
+@memory.cache
+def fit_model(model, X_train, y_train):
+    return model.fit(X_train, y_train)
+
+
+@memory.cache
+def tree_explainer(model, **kwargs):
+    return shap.TreeExplainer(model, **kwargs)
+
+
+@memory.cache
+def linear_explainer(model, X_background):
+    return shap.Explainer(model, X_background)
+
+
+def feature_index():
+    # Same dict explanation_to_vector uses, so there is one name -> column lookup
+    _, X, _ = load_data()
+    return feature_lookup(tuple(X.columns))[0]
+
+
+def need_fig(name):
+    # Redraw only when the figure is missing or older than the dataset
+    return not os.path.exists(name) or os.path.getmtime(name) < os.path.getmtime(DATA_PATH)
+
+
+@memory.cache
+def correlation_matrix(path, mtime):
+    # mtime is part of the cache key so an edited CSV invalidates the entry
+    return pd.read_csv(path).corr(numeric_only=True)
+
+
+@memory.cache
+def draw_correlation_matrix(path, mtime):
+    corr = correlation_matrix(path, mtime)
+    n = len(corr.columns)
+    fig, ax = plt.subplots(figsize=(10, 8))
+    im = ax.imshow(corr.values, cmap="magma")
+    ax.set_xticks(range(n))
+    ax.set_yticks(range(n))
+    ax.set_xticklabels(corr.columns, rotation=45, ha='right')
+    ax.set_yticklabels(corr.columns)
+    # Per-cell labels are the expensive part, so skip them for wide matrices
+    if n <= 10:
+        for (i, j), v in np.ndenumerate(corr.values):
+            ax.text(j, i, f"{v:.2f}", ha='center', va='center', fontsize=8,
+                    color='white' if im.norm(v) < 0.5 else 'black')
+    fig.colorbar(im)
+    plt.title("Fig. 2. Correlation coefficient matrix of diabetes")
+    plt.tight_layout()
+    plt.savefig("fig2_correlation_matrix.png")
+    plt.close()
+
+
+@memory.cache
+def draw_histograms(path, mtime):
+    df, _, _ = load_data()
+    df.hist(figsize=(12, 10), bins=20)
+    plt.suptitle("Fig. 3. Histogram of data set features", y=1.02)
+    plt.tight_layout()
+    plt.savefig("fig3_histograms.png")
+    plt.close()
+
+
+@memory.cache
+def draw_scatter_plot(path, mtime):
+    df, _, _ = load_data()
+    plt.figure(figsize=(8, 6))
+    sns.scatterplot(data=df, x='Glucose', y='Age', hue='Outcome', palette='coolwarm')
+    plt.title("Fig. 4. Scatter plot of two classes")
+    plt.tight_layout()
+    plt.savefig("fig4_scatter_plot.png")
+    plt.close()
+
+
+def shared_plots():
+    # Fig 2-4 only depend on the dataset, so draw them once for all models. joblib.Memory
+    # reruns a drawing function when its source or the CSV mtime changes; a missing or
+    # stale PNG forces the call even when the cache entry is still valid
+    args = (DATA_PATH, os.path.getmtime(DATA_PATH))
+    for draw, name in ((draw_correlation_matrix, "fig2_correlation_matrix.png"),
+                       (draw_histograms, "fig3_histograms.png"),
+                       (draw_scatter_plot, "fig4_scatter_plot.png")):
+        if need_fig(name):
+            draw.call(*args)
+        else:
+            draw(*args)
+
+
+def build_lime_explainer(X_train):
+    # Not disk-cached: the explainer's discretizer holds lambdas, which cannot be pickled
+    _, X, _ = load_data()
+    return LimeTabularExplainer(np.ascontiguousarray(X_train),
+                                feature_names=X.columns.tolist(),
+                                class_names=['No Diabetes', 'Diabetes'],
+                                mode='classification',
+                                random_state=42)
+
+
+def seeded_explainer(explainer, seed):
+    # Shallow copy with its own RandomState for the explainer, its discretizer and its
+    # LimeBase, so the draws a row gets do not depend on which thread runs it first
+    exp = copy.copy(explainer)
+    exp.random_state = np.random.RandomState(seed)
+    exp.base = copy.copy(explainer.base)
+    exp.base.random_state = exp.random_state
+    if explainer.discretizer is not None:
+        exp.discretizer = copy.copy(explainer.discretizer)
+        exp.discretizer.random_state = exp.random_state
+    return exp
+
+
+def explain_instances(explainer, rows, predict_fn, num_features, num_samples=1000, seed=42):
+    # LIME cost is dominated by num_samples predict_fn calls. sklearn's predict releases the
+    # GIL, so threads overlap them without pickling the model into worker processes
+    return Parallel(n_jobs=-1, backend='threading')(
+        delayed(seeded_explainer(explainer, seed + i).explain_instance)(
+            row, predict_fn, num_features=num_features, num_samples=num_samples)
+        for i, row in enumerate(rows))
+
+
+@lru_cache(maxsize=None)
+def feature_lookup(feature_names):
+    name_to_idx = {n: i for i, n in enumerate(feature_names)}
+    # Longest names first so a short name never matches inside a longer one
+    pattern = re.compile("|".join(map(re.escape, sorted(feature_names, key=len, reverse=True))))
+    return name_to_idx, pattern
+
+
+def explanation_to_dict(explanation, feature_names):
+    # Map LIME terms like 'Glucose <= 99.00' back to their feature name
+    _, pattern = feature_lookup(tuple(feature_names))
+    weights = {}
+    for feat, weight in explanation.as_list():
+        m = pattern.search(feat)
+        if m:
+            weights[m.group(0)] = weight
+    return weights
+
+
+def explanation_to_vector(explanation, feature_names):
+    name_to_idx, _ = feature_lookup(tuple(feature_names))
+    vec = np.zeros(len(feature_names))
+    for feat, weight in explanation_to_dict(explanation, feature_names).items():
+        vec[name_to_idx[feat]] = abs(weight)
+    return vec
+
+
+@njit(cache=True)
+def cos_sim(a, b):
+    # Plain loop rather than a 1x1 sklearn cosine_similarity matrix; works on strided views
+    dot = norm_a = norm_b = 0.0
+    for i in range(a.shape[0]):
+        dot += a[i] * b[i]
+        norm_a += a[i] * a[i]
+        norm_b += b[i] * b[i]
+    return dot / (np.sqrt(norm_a) * np.sqrt(norm_b) + 1e-12)
+
+
+# Compile at import for the signatures actually used: float64 contiguous LIME/linear
+# vectors and float32 strided rows of the tree scripts' class-1 SHAP slice
+cos_sim(np.zeros(8), np.zeros(8))
+_strided = np.zeros((2, 8, 2), dtype=np.float32)[:, :, 1]
+cos_sim(_strided[0], _strided[1])